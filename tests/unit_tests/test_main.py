@@ -7,7 +7,7 @@ from unittest.mock import patch
 
 import pytest
 
-from main import CSVProcessor, parse_args
+from main import CSVProcessor, _parse_filter_condition, apply_filter_then_agg, apply_filters, parse_args
 from tests.conftest import NO_RESULT, ExpectationType
 
 MOCK_PRODUCTS_PATH: Final[Path] = Path(__file__).parent / "mock_data" / "products.csv"
@@ -30,6 +30,64 @@ class TestCsvProcessor:
         assert processor.headers == ["name", "brand", "price", "rating"]
         assert sample_csv_file[1:] == processor.processed_data
 
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "name,price\nphone1,100\nphone2,200\n",
+            "name,price\r\nphone1,100\r\nphone2,200",
+            'name,price\n"phone1, pro",100\nphone2,200\n',
+            "name,price,rating\nphone1,,4.5\n",
+            "name,price\n",
+            "name,price\nphone1,100\n\nphone2,200\n",
+            "name,price\nphone1,100\nphone2,200\n\n",
+        ],
+    )
+    def test_parse_csv_file_formats(self, text: str, tmp_path: Path) -> None:
+        path = tmp_path / "products.csv"
+        path.write_text(text, newline="")
+        expected_rows = [row for row in csv.reader(text.splitlines()) if row]
+        processor = CSVProcessor(filename=path)
+        assert processor.headers == expected_rows[0]
+        assert processor.source_data == expected_rows[1:]
+
+    @pytest.mark.parametrize(
+        "text, message",
+        [
+            ("name,price\nphone1,100\nphone2\n", "Line 3 has 1 fields, expected 2"),
+            ("name,price\nphone1,100,9\n", "Line 2 has 3 fields, expected 2"),
+        ],
+    )
+    def test_parse_csv_file_ragged_rows(self, text: str, message: str, tmp_path: Path) -> None:
+        path = tmp_path / "products.csv"
+        path.write_text(text, newline="")
+        with pytest.raises(ValueError, match=message):
+            CSVProcessor(filename=path)
+
+    def test_duplicate_headers(self, tmp_path: Path) -> None:
+        path = tmp_path / "products.csv"
+        path.write_text("name,price,price\nphone1,100,1000\nphone2,200,2000\n")
+        processor = CSVProcessor(filename=path)
+        processor.filter(column="price", op=">", value="100")
+        assert processor.processed_data == [["phone2", "200", "2000"]]
+
+    def test_filter_large_integer(self, tmp_path: Path) -> None:
+        path = tmp_path / "ids.csv"
+        path.write_text("id,name\n9007199254740993,a\n9007199254740992,b\n")
+        processor = CSVProcessor(filename=path)
+        processor.filter(column="id", op="=", value="9007199254740993")
+        assert processor.processed_data == [["9007199254740993", "a"]]
+
+    def test_filter_numeric_on_selected_rows(self, tmp_path: Path) -> None:
+        path = tmp_path / "products.csv"
+        path.write_text("name,price\na,100\nb,N/A\nc,1000\n")
+        processor = CSVProcessor(filename=path)
+        processor.filter(column="name", op="!=", value="b").filter(column="price", op=">", value="150")
+        assert processor.processed_data == [["c", "1000"]]
+
+    def test_to_rows(self, processor: CSVProcessor) -> None:
+        processor.filter(column="brand", op="=", value="brand1")
+        assert processor.to_rows() == [["phone1", "brand1", "100", "4.5"], ["phone4", "brand1", "400", "4.8"]]
+
     @pytest.mark.parametrize(
         "column, op, value, expected_result, expectation",
         [
@@ -151,6 +209,26 @@ class TestCsvProcessor:
                 ],
                 does_not_raise(),
             ),
+            (
+                ["price", "price"],
+                [">=", ">"],
+                ["200", "200"],
+                [
+                    ["phone3", "brand3", "300", "3.5"],
+                    ["phone4", "brand1", "400", "4.8"],
+                    ["phone5", "brand2", "500", "4.2"],
+                ],
+                does_not_raise(),
+            ),
+            (
+                ["price", "price", "price"],
+                ["<=", "<", ">"],
+                ["300", "400", "100"],
+                [["phone2", "brand2", "200", "4.0"], ["phone3", "brand3", "300", "3.5"]],
+                does_not_raise(),
+            ),
+            (["price", "price"], [">", ">"], ["100", "nan"], [], does_not_raise()),
+            (["price", "price"], ["<", "<"], ["nan", "500"], [], does_not_raise()),
             # Exceptions
             (
                 ["nonexistent", "price"],
@@ -210,6 +288,33 @@ class TestCsvProcessor:
             processor.aggregate(column=column, agg_operation=agg_operation)
             assert processor.processed_data == expected_result
 
+    def test_aggregate_large_integer_sum(self, tmp_path: Path) -> None:
+        path = tmp_path / "ids.csv"
+        path.write_text("id\n9000000000000000000\n9000000000000000000\n")
+        processor = CSVProcessor(filename=path)
+        processor.aggregate(column="id", agg_operation="sum")
+        assert processor.processed_data == 18000000000000000000
+
+    @pytest.mark.parametrize(
+        "text, agg_operation, expected_result",
+        [
+            ("c\n99999999999999999999\n1\n", "max", 99999999999999999999),
+            ("c\n99999999999999999999\n1\n", "sum", 100000000000000000000),
+            ("c\n9007199254740993\n2.5\n", "max", 9007199254740993),
+            ("c\n3\n2.5\n", "max", 3),
+            ("c\n3.0\n2.5\n", "max", 3.0),
+        ],
+    )
+    def test_aggregate_exact_numbers(
+        self, text: str, agg_operation: str, expected_result: int | float, tmp_path: Path
+    ) -> None:
+        path = tmp_path / "values.csv"
+        path.write_text(text)
+        processor = CSVProcessor(filename=path)
+        processor.aggregate(column="c", agg_operation=agg_operation)
+        assert processor.processed_data == expected_result
+        assert type(processor.processed_data) is type(expected_result)
+
 
 @pytest.mark.parametrize(
     "argv, expected_file, expected_filters, expected_agg",
@@ -258,3 +363,55 @@ def test_parse_args(argv: list[str], expected_file: str, expected_filters: str,
         assert args.file == expected_file
         assert args.filter == expected_filters
         assert args.agg == expected_agg
+
+
+@pytest.mark.parametrize(
+    "condition, expected_result, expectation",
+    [
+        ("price>=149", ("price", ">=", "149"), does_not_raise()),
+        ("name=iphone 14", ("name", "=", "iphone 14"), does_not_raise()),
+        ("rating!=4.5", ("rating", "!=", "4.5"), does_not_raise()),
+        # Exceptions
+        ("price>>149", NO_RESULT, pytest.raises(ValueError, match="Invalid filter condition format")),
+        ("price", NO_RESULT, pytest.raises(ValueError, match="Invalid filter condition format")),
+    ],
+)
+def test_parse_filter_condition(
+    condition: str, expected_result: tuple[str, str, str], expectation: ExpectationType
+) -> None:
+    with expectation:
+        assert _parse_filter_condition(condition) == expected_result
+
+
+@pytest.mark.parametrize(
+    "conditions, agg_condition, expected_result",
+    [
+        (["brand=brand1"], "price=sum", "+-----+\n| sum |\n+-----+\n| 500 |\n+-----+"),
+        (["price>200", "rating>4.5"], "price=max", "+-----+\n| max |\n+-----+\n| 400 |\n+-----+"),
+        (["price>500"], "price=max", "No data to aggregate"),
+    ],
+)
+def test_apply_filter_then_agg(
+    conditions: list[str], agg_condition: str, expected_result: str, processor: CSVProcessor
+) -> None:
+    assert apply_filter_then_agg(processor, conditions, agg_condition) == expected_result
+
+
+@pytest.mark.parametrize(
+    "output_format, expected_result",
+    [
+        ("csv", "name,brand,price,rating\nphone1,brand1,100,4.5\nphone4,brand1,400,4.8"),
+        (
+            "grid",
+            "+--------+---------+---------+----------+\n"
+            "| name   | brand   |   price |   rating |\n"
+            "+========+=========+=========+==========+\n"
+            "| phone1 | brand1  |     100 |      4.5 |\n"
+            "+--------+---------+---------+----------+\n"
+            "| phone4 | brand1  |     400 |      4.8 |\n"
+            "+--------+---------+---------+----------+",
+        ),
+    ],
+)
+def test_apply_filters_output_format(output_format: str, expected_result: str, processor: CSVProcessor) -> None:
+    assert apply_filters(processor, ["brand=brand1"], output_format=output_format) == expected_result